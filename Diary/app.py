@@ -2,15 +2,36 @@ import os
 from dotenv import load_dotenv 
 load_dotenv()
 
+# Cooperative I/O under gevent. Deploy with:
+#   USE_GEVENT=1 gunicorn -k gevent -w 2 --worker-connections 500 Diary.app:app
+# The gevent worker monkey-patches sockets (covering SMTP); psycopg2 is a C
+# extension, so it needs psycogreen to yield while waiting on Postgres. Keep
+# DB_POOL_SIZE + DB_MAX_OVERFLOW large enough for the concurrent greenlets, and
+# set CACHE_TYPE=RedisCache since the workers don't share a SimpleCache.
+if os.environ.get('USE_GEVENT', 'False').lower() in ('true', '1', 't'):
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
 import secrets
+import smtplib
+import queue
+import threading
 import json
-from datetime import datetime
+import orjson
+import fastjsonschema
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse 
 
 # Flask and SQLAlchemy imports
-from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, insert, update, delete, exists, tuple_
+from sqlalchemy.exc import IntegrityError
+from flask_caching import Cache
 from werkzeug.security import generate_password_hash, check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from flask_login import UserMixin, login_user, LoginManager, current_user, logout_user, login_required
 
 # Flask-Mail and itsdangerous imports
@@ -46,6 +67,24 @@ DATABASE_URL = f'postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DB_NAME}'
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODELS'] = False
 
+# Connection pool sizing. Postgres max_connections must be at least
+# DB_POOL_SIZE + DB_MAX_OVERFLOW multiplied by the number of gunicorn workers.
+# When running behind PgBouncer in transaction mode, set DB_USE_NULLPOOL=1 so
+# PgBouncer owns the pooling instead of SQLAlchemy.
+if os.environ.get('DB_USE_NULLPOOL', 'False').lower() in ('true', '1', 't'):
+    from sqlalchemy.pool import NullPool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': NullPool,
+    }
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,  # Drop connections older than 30 minutes
+        'pool_timeout': 10,
+    }
+
 # 3. Flask-Mail Configuration
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
@@ -55,9 +94,27 @@ app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'YOUR_EMAIL_ADDRES
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'YOUR_EMAIL_APP_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 
+# Public base URL for links in outgoing emails; built without a request context.
+app.config['EXTERNAL_BASE_URL'] = os.environ.get('EXTERNAL_BASE_URL', 'http://localhost:5000').rstrip('/')
+if 'EXTERNAL_BASE_URL' not in os.environ:
+    print("WARNING: EXTERNAL_BASE_URL is not set; password reset emails will link to http://localhost:5000.")
+
+# Mail settings don't change at runtime, so decide once whether sending is possible.
+_EMAIL_CONFIGURED = bool(app.config.get('MAIL_USERNAME')) and app.config['MAIL_USERNAME'] != 'YOUR_EMAIL_ADDRESS@gmail.com'
+
+# 4. Cache Configuration (use CACHE_TYPE=RedisCache with CACHE_REDIS_URL in production)
+# SimpleCache lives inside one process. With several gunicorn workers, clearing the
+# cached user after a password change only reaches the worker that handled it; the
+# others keep the old entry for up to CACHE_DEFAULT_TIMEOUT seconds. Use a shared
+# backend such as Redis whenever more than one worker runs.
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'SimpleCache')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_DEFAULT_TIMEOUT'] = 300
+
 # Initialize extensions
 db = SQLAlchemy(app)
 mail = Mail(app) 
+cache = Cache(app)
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -65,9 +122,41 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message_category = 'danger'
 
+@cache.memoize(timeout=300)
+def _load_user_cached(user_id):
+    # Only plain column values are cached, never the ORM instance or its relationships.
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+    return {'id': user.id, 'email': user.email, 'password_hash': user.password_hash}
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    data = _load_user_cached(int(user_id))
+    if data is None:
+        return None
+    return User(**data)
+
+# --- Password Reset Tokens ---
+# Built once; SECRET_KEY is fixed for the life of the process.
+_reset_serializer = Serializer(secret_key=app.config['SECRET_KEY'], salt='password-reset-salt')
+
+# --- Password Hashing ---
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+DUMMY_PASSWORD_HASH = password_hasher.hash(secrets.token_urlsafe(16))
+
+# While some users still have Werkzeug PBKDF2 hashes (~600k iterations, far slower
+# than Argon2 here), every password check runs both an Argon2 and a Werkzeug
+# verification so unknown, legacy and upgraded accounts all take the same time.
+# Set LEGACY_PASSWORD_HASHES=0 once every account has been rehashed to Argon2.
+LEGACY_PASSWORD_HASHES = os.environ.get('LEGACY_PASSWORD_HASHES', 'True').lower() in ('true', '1', 't')
+LEGACY_DUMMY_PASSWORD_HASH = generate_password_hash(secrets.token_urlsafe(16)) if LEGACY_PASSWORD_HASHES else None
+
+def _verify_argon2(password_hash, password):
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 # --- Database Models ---
 
@@ -77,29 +166,44 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     
     password_hash = db.Column(db.String(255), nullable=False) 
-    entries = db.relationship('Entry', backref='author', lazy='dynamic')
+    # Entries are always queried directly by user_id; loading them through this
+    # relationship is treated as a bug and raises instead of issuing a hidden query.
+    entries = db.relationship('Entry', backref=db.backref('author', lazy='joined'), lazy='raise_on_sql')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not self.password_hash.startswith('$argon2'):
+            # Legacy Werkzeug (PBKDF2/scrypt) hash from before the Argon2 switch.
+            _verify_argon2(DUMMY_PASSWORD_HASH, password)
+            return check_password_hash(self.password_hash, password)
+        result = _verify_argon2(self.password_hash, password)
+        if LEGACY_PASSWORD_HASHES:
+            check_password_hash(LEGACY_DUMMY_PASSWORD_HASH, password)
+        return result
+
+    def password_needs_rehash(self):
+        """True for legacy Werkzeug hashes or Argon2 hashes made with older cost parameters."""
+        if not self.password_hash.startswith('$argon2'):
+            return True
+        return password_hasher.check_needs_rehash(self.password_hash)
+
+    @staticmethod
+    def dummy_check_password(password):
+        """Spends the same time as a real check so a missing account can't be detected by timing."""
+        _verify_argon2(DUMMY_PASSWORD_HASH, password)
+        if LEGACY_PASSWORD_HASHES:
+            check_password_hash(LEGACY_DUMMY_PASSWORD_HASH, password)
+        return False
     
     def get_reset_token(self, expires_sec=1800):
-        s = Serializer(
-            secret_key=current_app.config['SECRET_KEY'],
-            salt='password-reset-salt'
-        )
-        return s.dumps({'user_id': self.id})
+        return _reset_serializer.dumps({'user_id': self.id})
 
     @staticmethod
     def verify_reset_token(token):
-        s = Serializer(
-            secret_key=current_app.config['SECRET_KEY'],
-            salt='password-reset-salt'
-        )
         try:
-            data = s.loads(token, max_age=1800)
+            data = _reset_serializer.loads(token, max_age=1800)
         except (SignatureExpired, BadSignature):
             return None
         return User.query.get(data['user_id'])
@@ -115,6 +219,13 @@ class Entry(db.Model):
     
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) 
 
+# Serves the per-user, newest-first listing (and its keyset cursor) straight from the index.
+# Its (user_id, date_modified DESC) prefix also covers plain per-user ordering by date_modified.
+ix_entry_user_modified = db.Index('ix_entry_user_modified', Entry.user_id, Entry.date_modified.desc(), Entry.id.desc())
+# Case-insensitive email uniqueness / lookups on the login path. New emails are stored
+# lowercased, and lookups compare against lower(email) so rows saved before that still match.
+ix_users_email_lower = db.Index('ix_users_email_lower', db.func.lower(User.email), unique=True)
+
 # --- CLI Commands ---
 
 @app.cli.command('init-db')
@@ -127,53 +238,184 @@ def init_db_command():
     except Exception as e:
         print(f"Error initializing database: {e}")
 
+@app.cli.command('create-indexes')
+def create_indexes_command():
+    """Adds any missing indexes to an existing database without dropping data."""
+    try:
+        for index in (ix_entry_user_modified, ix_users_email_lower):
+            index.create(bind=db.engine, checkfirst=True)
+        print('Indexes created (existing ones were left untouched).')
+    except Exception as e:
+        print(f"Error creating indexes: {e}")
+
 # --- Helper Function for Email ---
-def send_reset_email(user):
-    with app.app_context():
-        # This line calls the function that was causing the error
-        token = user.get_reset_token()
-        msg = Message('Personal Diary - Password Reset Request',
-                      sender=app.config['MAIL_DEFAULT_SENDER'],
-                      recipients=[user.email])
-        
-        reset_url = url_for('reset_token', token=token, _external=True)
-        
-        msg.body = f"""To reset your password, visit the following link:
+
+# SMTP sends run on a small background pool so a slow or unreachable mail
+# server never blocks a request worker.
+email_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mail')
+
+# Each email worker thread keeps its own SMTP session open between sends so a
+# burst of emails pays the TLS + AUTH handshake once. A timer closes the session
+# once it has been idle for SMTP_IDLE_TIMEOUT seconds.
+SMTP_IDLE_TIMEOUT = 60
+_smtp_local = threading.local()
+
+class _SmtpSession:
+    """One email worker thread's SMTP connection. The lock is shared with the idle timer."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.sends = 0
+        self.idle_timer = None
+
+    def _close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    def _connection(self):
+        if self.conn is not None and self.conn.host is not None:
+            # host is None when MAIL_SUPPRESS_SEND or TESTING is on; there is no socket to check.
+            try:
+                self.conn.host.noop()
+            except (smtplib.SMTPException, OSError):
+                self._close()
+
+        if self.conn is None:
+            conn = mail.connect()
+            conn.__enter__()
+            self.conn = conn
+        return self.conn
+
+    def _close_if_idle(self, sends):
+        with self.lock:
+            if sends == self.sends:
+                self._close()
+
+    def send(self, msg):
+        with self.lock:
+            if self.idle_timer is not None:
+                self.idle_timer.cancel()
+            self.sends += 1
+            try:
+                try:
+                    self._connection().send(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped us between the health check and the send; retry once.
+                    self._close()
+                    self._connection().send(msg)
+            except Exception:
+                self._close()
+                raise
+            finally:
+                self.idle_timer = threading.Timer(SMTP_IDLE_TIMEOUT, self._close_if_idle, args=(self.sends,))
+                self.idle_timer.daemon = True
+                self.idle_timer.start()
+
+def _smtp_session():
+    session = getattr(_smtp_local, 'session', None)
+    if session is None:
+        session = _smtp_local.session = _SmtpSession()
+    return session
+
+# Queued reset emails are drained in batches of up to EMAIL_BATCH_SIZE over one
+# SMTP session. If more than a third of a batch fails the rest of it is dropped
+# rather than hammering a broken mail server.
+EMAIL_BATCH_SIZE = 100
+_email_queue = queue.Queue()
+
+def _build_reset_message(email, reset_url):
+    msg = Message('Personal Diary - Password Reset Request',
+                  sender=app.config['MAIL_DEFAULT_SENDER'],
+                  recipients=[email])
+
+    msg.body = f"""To reset your password, visit the following link:
 {reset_url}
 
 If you did not make this request then simply ignore this email and no changes will be made.
 The link will expire in 30 minutes.
 """
-        
-        if app.config.get('MAIL_USERNAME') == 'YOUR_EMAIL_ADDRESS@gmail.com' or not app.config.get('MAIL_USERNAME'):
-            flash('Email service is not fully configured. Please check MAIL_USERNAME/PASSWORD in .env.', 'danger')
-            print("WARNING: Email skipped because MAIL_USERNAME is the default placeholder or empty.")
-            return
+    return msg
 
+def _drain_email_queue(flask_app):
+    """Sends one batch of queued reset emails. Runs on the email executor, outside any request."""
+    batch = []
+    while len(batch) < EMAIL_BATCH_SIZE:
+        try:
+            batch.append(_email_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return
+
+    with flask_app.app_context():
+        user_ids = {user_id for user_id, _ in batch}
         try:
-            mail.send(msg)
-            flash(f'An email has been sent to {user.email} with instructions to reset your password.', 'info')
+            emails = dict(db.session.execute(select(User.id, User.email).where(User.id.in_(user_ids))).all())
         except Exception as e:
-            print(f"Flask-Mail Error: Could not send email. Check MAIL_ settings in .env. Error: {e}")
-            flash('Password reset link could not be sent due to an email service error. Please check your credentials.', 'danger')
+            # Nothing observes the executor's Future, so report the lost batch here.
+            print(f"Flask-Mail Error: Could not look up recipients, dropping {len(batch)} queued email(s). Error: {e}")
+            return
+
+        failures = 0
+        for index, (user_id, reset_url) in enumerate(batch):
+            if user_id not in emails:
+                continue
+            try:
+                _smtp_session().send(_build_reset_message(emails[user_id], reset_url))
+            except Exception as e:
+                print(f"Flask-Mail Error: Could not send email. Check MAIL_ settings in .env. Error: {e}")
+                failures += 1
+                remaining = len(batch) - index - 1
+                if remaining and failures * 3 > len(batch):
+                    print(f"Flask-Mail Error: Too many failures, dropping {remaining} queued email(s).")
+                    break
+
+def send_reset_email(user):
+    """Generates the reset link on the request thread and queues the email for delivery."""
+    if not _EMAIL_CONFIGURED:
+        flash('Email service is not fully configured. Please check MAIL_USERNAME/PASSWORD in .env.', 'danger')
+        print("WARNING: Email skipped because MAIL_USERNAME is the default placeholder or empty.")
+        return
+
+    token = user.get_reset_token()
+    # Build the path from the URL map (no request context needed) so it follows the route definition.
+    reset_path = app.url_map.bind('').build('reset_token', {'token': token})
+    reset_url = f"{app.config['EXTERNAL_BASE_URL']}{reset_path}"
+
+    _email_queue.put((user.id, reset_url))
+    email_executor.submit(_drain_email_queue, current_app._get_current_object())
         
 
 # --- Routes: Authentication ---
 
+def normalize_email(value):
+    """Emails are stored and looked up lowercased so 'Alice@x.com' and 'alice@x.com' are one account."""
+    return (value or '').strip().lower()
+
+def _skip_page_cache():
+    """Auth pages are only served from cache for anonymous GETs with no pending flash messages."""
+    return request.method != 'GET' or current_user.is_authenticated or '_flashes' in session
+
 @app.route('/register', methods=['GET', 'POST'])
+@cache.cached(timeout=3600, key_prefix='tmpl:register', unless=_skip_page_cache)
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('diary'))
         
     if request.method == 'POST':
-        email = request.form.get('email')
+        email = normalize_email(request.form.get('email'))
         password = request.form.get('password')
         
         if not email or not password:
             flash('Both email and password are required.', 'danger')
             return redirect(url_for('register'))
             
-        if User.query.filter_by(email=email).first():
+        if db.session.scalar(select(exists().where(db.func.lower(User.email) == email))):
             flash('Email already registered. Please log in or use a different one.', 'danger')
             return redirect(url_for('register'))
 
@@ -184,6 +426,11 @@ def register():
             db.session.commit()
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
+        except IntegrityError:
+            # Lost a race with a concurrent registration for the same email.
+            db.session.rollback()
+            flash('Email already registered. Please log in or use a different one.', 'danger')
+            return redirect(url_for('register'))
         except Exception as e:
             db.session.rollback()
             flash('An internal error occurred during registration. Please try again.', 'danger')
@@ -193,13 +440,14 @@ def register():
     return render_template('register.html')
   
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@cache.cached(timeout=3600, key_prefix='tmpl:forgot_password', unless=_skip_page_cache)
 def forgot_password():
     if current_user.is_authenticated:
         return redirect(url_for('diary'))
         
     if request.method == 'POST':
-        email = request.form.get('email')
-        user = User.query.filter_by(email=email).first()
+        email = normalize_email(request.form.get('email'))
+        user = User.query.filter(db.func.lower(User.email) == email).first()
         
         if user:
             send_reset_email(user)
@@ -231,6 +479,7 @@ def reset_token(token):
 
         user.set_password(password)
         db.session.commit()
+        cache.delete_memoized(_load_user_cached, user.id)
         flash('Your password has been updated! Please log in with your new password.', 'success')
         return redirect(url_for('login'))
 
@@ -243,12 +492,19 @@ def login():
         return redirect(url_for('diary'))
 
     if request.method == 'POST':
-        email = request.form.get('email')
+        email = normalize_email(request.form.get('email'))
         password = request.form.get('password')
         
-        user = User.query.filter_by(email=email).first()
+        user = User.query.filter(db.func.lower(User.email) == email).first()
         
-        if user and user.check_password(password):
+        if user is None:
+            User.dummy_check_password(password or '')
+        elif user.check_password(password or ''):
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+                cache.delete_memoized(_load_user_cached, user.id)
+
             login_user(user)
             
             if 'first_login' not in session:
@@ -256,9 +512,9 @@ def login():
                 session['first_login'] = True
             
             return redirect(url_for('diary'))
-        else:
-            flash('Invalid email or password.', 'danger')
-            return redirect(url_for('login'))
+
+        flash('Invalid email or password.', 'danger')
+        return redirect(url_for('login'))
             
     return render_template('index.html') 
 
@@ -274,52 +530,151 @@ def logout():
 
 @app.route('/')
 @login_required
+@cache.cached(timeout=3600, key_prefix='tmpl:diary')
 def diary():
     """Main application page to display the diary interface."""
     return render_template('diary.html') 
 
 
+ENTRIES_PAGE_SIZE = 50
+ENTRIES_MAX_PAGE_SIZE = 200
+
+def _serialize_entry(row):
+    return {
+        'id': row['id'],
+        'encrypted_title': row['encrypted_title'],
+        'encrypted_content': row['encrypted_content'],
+        'date_created': row['date_created'],
+        'date_modified': row['date_modified']
+    }
+
+def _json_response(payload, status=200):
+    """Serializes with orjson; datetimes are emitted as ISO 8601 UTC."""
+    return Response(orjson.dumps(payload, option=orjson.OPT_NAIVE_UTC), status=status, mimetype='application/json')
+
+ENTRIES_STREAM_CHUNK_SIZE = 200
+
+def _stream_entries(result):
+    """Yields a JSON array of entries from an already-executed streaming result."""
+    separator = b'['
+    for row in result.mappings():
+        yield separator + orjson.dumps(_serialize_entry(row), option=orjson.OPT_NAIVE_UTC)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+# Compiled once at import; validates create/update bodies.
+_entry_validator = fastjsonschema.compile({
+    'type': 'object',
+    'required': ['encrypted_title', 'encrypted_content'],
+    'properties': {
+        'encrypted_title': {'type': 'string', 'minLength': 1, 'maxLength': 500},
+        'encrypted_content': {'type': 'string', 'minLength': 1}
+    }
+})
+
+def _parse_entry_payload():
+    """Parses and validates the entry JSON body. Returns (data, error_message)."""
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None, 'Request body must be valid JSON'
+    try:
+        _entry_validator(data)
+    except fastjsonschema.JsonSchemaException as e:
+        return None, str(e)
+    return data, None
+
 @app.route('/api/entries', methods=['GET'])
 @login_required
 def get_entries():
-    """Retrieves all encrypted entries for the current user."""
-    entries = Entry.query.filter_by(user_id=current_user.id).order_by(Entry.date_modified.desc()).all()
-    
-    return jsonify([{
-        'id': entry.id,
-        'encrypted_title': entry.encrypted_title,
-        'encrypted_content': entry.encrypted_content,
-        'date_created': entry.date_created.strftime('%Y-%m-%d %H:%M:%S'),
-        'date_modified': entry.date_modified.strftime('%Y-%m-%d %H:%M:%S')
-    } for entry in entries]), 200
+    """Retrieves encrypted entries for the current user, newest first.
+
+    Without query parameters every entry is returned. Passing ``limit`` and/or the
+    ``before_modified`` (ISO 8601) + ``before_id`` cursor pages through the list; the
+    cursor for the next page is returned in the X-Next-Before-* response headers.
+    """
+    uid = current_user.id
+    stmt = select(
+        Entry.id,
+        Entry.encrypted_title,
+        Entry.encrypted_content,
+        Entry.date_created,
+        Entry.date_modified
+    ).where(Entry.user_id == uid).order_by(Entry.date_modified.desc(), Entry.id.desc())
+
+    limit = request.args.get('limit', type=int)
+    before_modified = request.args.get('before_modified')
+    before_id = request.args.get('before_id', type=int)
+    paginate = 'limit' in request.args or before_modified is not None
+
+    if 'limit' in request.args and (limit is None or limit < 1):
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    if 'before_id' in request.args and before_id is None:
+        return jsonify({'error': 'before_id must be an integer'}), 400
+
+    if before_modified is None and 'before_id' in request.args:
+        return jsonify({'error': 'before_modified is required with before_id'}), 400
+
+    if before_modified is not None:
+        try:
+            before_modified = datetime.fromisoformat(before_modified)
+        except ValueError:
+            return jsonify({'error': 'before_modified must be an ISO 8601 timestamp'}), 400
+        if before_modified.tzinfo is not None:
+            # date_modified is a naive UTC column; compare like with like.
+            before_modified = before_modified.astimezone(timezone.utc).replace(tzinfo=None)
+        if before_id is None:
+            return jsonify({'error': 'before_id is required with before_modified'}), 400
+        stmt = stmt.where(tuple_(Entry.date_modified, Entry.id) < (before_modified, before_id))
+
+    if not paginate:
+        # The full list is unbounded, so stream it from a server-side cursor one
+        # chunk at a time instead of holding every row and the whole payload in memory.
+        # The query runs here, before the 200 is sent, so DB errors still surface as a 500.
+        result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=ENTRIES_STREAM_CHUNK_SIZE))
+        return Response(stream_with_context(_stream_entries(result)), mimetype='application/json')
+
+    limit = min(limit or ENTRIES_PAGE_SIZE, ENTRIES_MAX_PAGE_SIZE)
+    stmt = stmt.limit(limit)
+
+    rows = db.session.execute(stmt).mappings().all()
+    response = _json_response([_serialize_entry(row) for row in rows])
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers['X-Next-Before-Modified'] = last['date_modified'].isoformat()
+        response.headers['X-Next-Before-Id'] = str(last['id'])
+
+    return response
 
 
 @app.route('/api/entries', methods=['POST'])
 @login_required
 def create_entry():
     """Creates a new encrypted diary entry."""
-    data = request.json
-    
-    encrypted_title = data.get('encrypted_title')
-    encrypted_content = data.get('encrypted_content')
+    uid = current_user.id
+    data, error = _parse_entry_payload()
+    if error:
+        return jsonify({'error': error}), 400
 
-    if not encrypted_title or not encrypted_content:
-        return jsonify({'error': 'Missing encrypted title or content'}), 400
+    encrypted_title = data['encrypted_title']
+    encrypted_content = data['encrypted_content']
 
-    new_entry = Entry(
+    # INSERT ... RETURNING hands back the generated id and timestamp without a refresh SELECT.
+    stmt = insert(Entry).values(
         encrypted_title=encrypted_title,
         encrypted_content=encrypted_content,
-        user_id=current_user.id
-    )
+        user_id=uid
+    ).returning(Entry.id, Entry.date_modified)
     
     try:
-        db.session.add(new_entry)
+        row = db.session.execute(stmt).one()
         db.session.commit()
-        return jsonify({
+        return _json_response({
             'message': 'Entry created successfully.',
-            'id': new_entry.id,
-            'date_modified': new_entry.date_modified.strftime('%Y-%m-%d %H:%M:%S')
-        }), 201
+            'id': row.id,
+            'date_modified': row.date_modified
+        }, 201)
     except Exception as e:
         db.session.rollback()
         print(f"Error creating entry: {e}")
@@ -329,41 +684,54 @@ def create_entry():
 @app.route('/api/entries/<int:entry_id>', methods=['PUT'])
 @login_required
 def update_entry(entry_id):
-    """Updates an existing encrypted diary entry."""
-    entry = Entry.query.get_or_404(entry_id)
-    
-    if entry.user_id != current_user.id:
-        return jsonify({'error': 'Unauthorized access'}), 403
-
-    data = request.json
-    
-    encrypted_title = data.get('encrypted_title')
-    encrypted_content = data.get('encrypted_content')
+    """Updates an existing encrypted diary entry owned by the current user."""
+    uid = current_user.id
+    data, error = _parse_entry_payload()
+    if error:
+        return jsonify({'error': error}), 400
+
+    encrypted_title = data['encrypted_title']
+    encrypted_content = data['encrypted_content']
+
+    # Ownership is part of the WHERE clause, so a foreign or missing entry simply matches no row.
+    stmt = update(Entry).where(
+        Entry.id == entry_id,
+        Entry.user_id == uid
+    ).values(
+        encrypted_title=encrypted_title,
+        encrypted_content=encrypted_content,
+        date_modified=datetime.utcnow()
+    ).returning(Entry.date_modified)
 
-    if not encrypted_title or not encrypted_content:
-        return jsonify({'error': 'Missing encrypted title or content'}), 400
+    try:
+        date_modified = db.session.execute(stmt).scalar_one_or_none()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating entry: {e}")
+        return jsonify({'error': 'Database error while updating entry.'}), 500
 
-    entry.encrypted_title = encrypted_title
-    entry.encrypted_content = encrypted_content
-    db.session.commit()
+    if date_modified is None:
+        return jsonify({'error': 'Entry not found'}), 404
     
-    return jsonify({
+    return _json_response({
         'message': 'Entry updated successfully.',
-        'id': entry.id,
-        'date_modified': entry.date_modified.strftime('%Y-%m-%d %H:%M:%S')
-    }), 200
+        'id': entry_id,
+        'date_modified': date_modified
+    })
 
 @app.route('/api/entries/<int:entry_id>', methods=['DELETE'])
 @login_required
 def delete_entry(entry_id):
-    """Deletes a diary entry."""
-    entry = Entry.query.get_or_404(entry_id)
-    
-    if entry.user_id != current_user.id:
-        return jsonify({'error': 'Unauthorized access'}), 403
-
-    db.session.delete(entry)
+    """Deletes a diary entry owned by the current user."""
+    uid = current_user.id
+    result = db.session.execute(
+        delete(Entry).where(Entry.id == entry_id, Entry.user_id == uid)
+    )
     db.session.commit()
+
+    if not result.rowcount:
+        return jsonify({'error': 'Entry not found'}), 404
     
     return jsonify({'message': 'Entry deleted successfully.'}), 200
 